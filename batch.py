@@ -0,0 +1,230 @@
+"""
+runs leaguer.py over many competition directories at once, biggest competitions first
+usage like:
+docker exec -ti leaguer-app-1 python3 batch.py 2025-06-Mixed 2025-06-MensLadies --start-date 04/07/2025 --weeks 6 --restdays 6
+or, with no directories given, every directory next to this script holding a fixtures and slots file is scheduled.
+
+A competition directory may contain an args.txt holding its own leaguer.py arguments, eg "04/07/2025 --weeks 6 --restdays 6",
+which are used instead of the --start-date/--weeks/--restdays/--spread given here.
+"""
+import csv
+import os
+import glob
+import shlex
+import argparse
+import subprocess
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas
+
+parser = argparse.ArgumentParser()
+parser.add_argument("directories", type=str, nargs="*", help="competition directories to schedule, defaults to all found")
+parser.add_argument("-d", "--start-date", type=str, help="start date for competitions without an args.txt, format 31/12/2021")
+parser.add_argument("-w", "--weeks", type=int, help="passed to leaguer.py for competitions without an args.txt")
+parser.add_argument("-r", "--restdays", type=int, help="passed to leaguer.py for competitions without an args.txt")
+parser.add_argument("-s", "--spread", type=int, help="passed to leaguer.py for competitions without an args.txt")
+parser.add_argument("-c", "--csv", action="store_true", help="ingest and output csv files instead of xlsx files")
+parser.add_argument("-j", "--jobs", type=int, default=0, help="maximum number of competitions to solve at once, 0 to size by cores and memory")
+parser.add_argument("-m", "--job-memory", type=int, default=1024, help="megabytes of memory to allow for each z3 instance")
+
+args = parser.parse_args()
+
+file_format      = 'csv' if args.csv else 'xlsx'
+newline          = "\r\n"
+dir_path         = os.path.dirname(os.path.realpath(__file__))
+leaguer_filename = os.path.join(dir_path, 'leaguer.py')
+summary_filename = os.path.join(dir_path, 'batch-summary.csv')
+
+
+def find_competition_directories():
+    """ returns every directory beside this script containing both a fixtures and a slots file """
+    found = []
+    for entry in sorted(os.listdir(dir_path)):
+        path = os.path.join(dir_path, entry)
+        if (os.path.isfile(os.path.join(path, f'fixtures.{file_format}'))
+                and os.path.isfile(os.path.join(path, f'slots.{file_format}'))):
+            found.append(path)
+    return found
+
+
+def load_fixtures(directory):
+    fixtures_filename = os.path.join(directory, f'fixtures.{file_format}')
+    if file_format == 'xlsx':
+        with open(fixtures_filename, "rb") as xlsxfile:
+            fixtures_dataframe = pandas.read_excel(xlsxfile, engine="openpyxl", na_filter=False)
+            fixtures = fixtures_dataframe.to_dict(orient="records")
+            return [{k.strip(): v for k, v in fixture.items()} for fixture in fixtures]
+    with open(fixtures_filename, newline=newline) as csvfile:
+        return list(csv.DictReader(csvfile, delimiter=',', quotechar='"'))
+
+
+def estimate_cost(directory):
+    """
+    returns (divisions, teams, cost) for a competition, where cost approximates the solving effort.
+    leaguer.py's largest constraints (play once per week, enough rest) grow with the cube of a division's size
+    """
+    teams_by_division = {}
+    for fixture in load_fixtures(directory):
+        if fixture['Team 1'] == 'Bye':
+            continue
+        teams = teams_by_division.setdefault(fixture['Draw'], set())
+        for team in (fixture['Team 1'], fixture['Team 2']):
+            if str(team).strip():
+                teams.add(team)
+    cost = sum(len(teams) ** 3 for teams in teams_by_division.values())
+    return len(teams_by_division), sum(len(teams) for teams in teams_by_division.values()), cost
+
+
+def leaguer_arguments(directory):
+    """ returns the leaguer.py arguments for a directory, or None if it has no start date """
+    args_filename = os.path.join(directory, 'args.txt')
+    if os.path.isfile(args_filename):
+        with open(args_filename) as argsfile:
+            return [directory] + shlex.split(argsfile.read())
+    if not args.start_date:
+        return None
+    arguments = [directory, args.start_date]
+    for flag, value in (('--weeks', args.weeks), ('--restdays', args.restdays), ('--spread', args.spread)):
+        if value is not None:
+            arguments += [flag, str(value)]
+    if args.csv:
+        arguments.append('--csv')
+    return arguments
+
+
+def available_memory_mb():
+    """ returns available memory in megabytes, preferring MemAvailable as free memory excludes reclaimable cache """
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except IOError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def claim_threads():
+    """
+    returns how many z3 threads a starting job may use: the cores not held by running jobs, shared
+    between this job and the others that can start alongside it, so the last jobs pick up freed cores
+    """
+    with pool_lock:
+        pool_state['queued'] -= 1
+        starting = 1 + min(workers - pool_state['running'] - 1, pool_state['queued'])
+        threads = max(1, (cores - pool_state['busy_cores']) // starting)
+        pool_state['running'] += 1
+        pool_state['busy_cores'] += threads
+        return threads
+
+
+def release_threads(threads):
+    with pool_lock:
+        pool_state['running'] -= 1
+        pool_state['busy_cores'] -= threads
+
+
+def run_job(job):
+    """ runs leaguer.py for one competition, logging its output, and returns the finished job """
+    threads = job['threads'] = claim_threads()
+    try:
+        return run_leaguer(job, threads)
+    except Exception as e:  # eg an unwritable log file, which shouldn't stop the rest of the batch
+        job['status'] = f'failed: {e}'
+        return job
+    finally:
+        release_threads(threads)
+
+
+def run_leaguer(job, threads):
+    log_filename = os.path.join(job['directory'], 'leaguer.log')
+    started = time.time()
+    with open(log_filename, 'w') as logfile:
+        completed = subprocess.run([sys.executable, leaguer_filename] + job['arguments'] + ['--threads', str(threads)],
+                                   cwd=dir_path, stdout=logfile, stderr=subprocess.STDOUT)
+    results = [x for x in glob.glob(os.path.join(job['directory'], f'results-*.{file_format}'))
+               if os.path.getmtime(x) >= started]
+    job['seconds'] = int(time.time() - started)
+    job['log_file'] = log_filename
+    job['results_file'] = max(results, key=os.path.getmtime) if results else ''
+    # leaguer.py exits cleanly when its input files fail validation, so no results file also means failure
+    job['status'] = 'ok' if completed.returncode == 0 and results else 'failed'
+    return job
+
+
+directories = [os.path.realpath(x.rstrip('/')) for x in args.directories] or find_competition_directories()
+if not directories:
+    print(f'No competition directories with fixtures.{file_format} and slots.{file_format} found')
+    exit()
+
+jobs, skipped = [], []
+for directory in directories:
+    job = {'directory': directory, 'name': os.path.basename(directory), 'threads': 0,
+           'seconds': 0, 'results_file': '', 'log_file': ''}
+    job['arguments'] = leaguer_arguments(directory)
+    try:
+        job['divisions'], job['teams'], job['cost'] = estimate_cost(directory)
+    except Exception as e:  # a corrupt or malformed fixtures file shouldn't stop the other competitions
+        job['divisions'], job['teams'], job['cost'] = 0, 0, 0
+        job['status'] = f'skipped: could not read fixtures ({e})'
+        skipped.append(job)
+        continue
+    if job['arguments'] is None:
+        job['status'] = 'skipped: no args.txt and no --start-date given'
+        skipped.append(job)
+        continue
+    jobs.append(job)
+
+# Longest-processing-time-first: starting the biggest competitions earliest stops one large
+# solve being left running alone on an otherwise idle machine at the end of the batch
+jobs.sort(key=lambda x: x['cost'], reverse=True)
+
+cores = os.cpu_count() or 1
+workers = args.jobs or cores
+memory_mb = available_memory_mb()
+if memory_mb:
+    workers = min(workers, max(1, memory_mb // args.job_memory))
+workers = max(1, min(workers, len(jobs) or 1))
+pool_lock = threading.Lock()
+pool_state = {'queued': len(jobs), 'running': 0, 'busy_cores': 0}
+
+print(f'{len(jobs)} competitions to schedule on {cores} cores'
+      + (f' with {memory_mb}MB available memory' if memory_mb else '')
+      + f': {workers} at a time, starting with {max(1, cores // workers)} z3 threads each')
+for job in jobs:
+    print(f" - {job['name']:<30} {job['divisions']:>3} divisions {job['teams']:>4} teams  cost {job['cost']}")
+for job in skipped:
+    print(f" ! {job['name']:<30} {job['status']}")
+print('')
+
+total_cost = sum(x['cost'] for x in jobs) or 1
+done_cost = 0
+batch_started = time.time()
+with ThreadPoolExecutor(max_workers=workers) as executor:
+    futures = []
+    for job in jobs:
+        futures.append(executor.submit(run_job, job))
+    for done, future in enumerate(as_completed(futures), 1):
+        job = future.result()
+        done_cost += job['cost']
+        elapsed = int(time.time() - batch_started)
+        print(f"[{done:>{len(str(len(jobs)))}}/{len(jobs)} done, {100 * done_cost // total_cost:>3}% of estimated work,"
+              f" {elapsed // 60}m{elapsed % 60:02}s] {job['name']} {job['status']} with {job['threads']} threads"
+              f" in {job['seconds'] // 60}m{job['seconds'] % 60:02}s"
+              + (f" -> {os.path.relpath(job['results_file'], dir_path)}" if job['results_file'] else f" see {job['log_file']}" if job['log_file'] else ''))
+
+summary_headers = ['directory', 'status', 'divisions', 'teams', 'cost', 'threads', 'seconds', 'results_file', 'log_file']
+with open(summary_filename, 'w', newline='') as csvfile:
+    writer = csv.DictWriter(csvfile, fieldnames=summary_headers, delimiter=',', quotechar='"', extrasaction='ignore')
+    writer.writeheader()
+    for job in jobs + skipped:
+        writer.writerow(job)
+
+failed = [x for x in jobs if x['status'] != 'ok']
+print('')
+print(f'{len(jobs) - len(failed)} of {len(jobs)} competitions scheduled, {len(skipped)} skipped - summary in {summary_filename}')
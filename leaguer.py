@@ -3,16 +3,15 @@ usage like:
 docker exec -ti leaguer-app-1 python3 leaguer.py 2025-06-Mixed 04/07/2025 --weeks 6 --restdays 6
 """
 import csv
+import json
 import pandas
 from datetime import datetime, timedelta
 import os
+import sys
 import argparse
 
 from z3 import Bool, Int, Solver, And, Or, Not, Implies, If, sat, set_param
 
-set_param('parallel.enable', True)
-set_param('parallel.threads.max', 4)
-
 parser = argparse.ArgumentParser()
 parser.add_argument("directory", type=str, help="path to directory containing the fixtures.xlsx and slots.xlsx files")
 parser.add_argument("start_date", type=str, help="start date for the competition in format 31/12/2021")
@@ -23,9 +22,15 @@ parser.add_argument("-r", "--restdays", type=int, default=5,
 parser.add_argument("-s", "--spread", type=int, default=1, help="allows the weeks of the competition to be spread out, "+
                                                                 "eg =2 for interleaving with another competition on alternating weeks")
 parser.add_argument("-c", "--csv", action="store_true", help="ingest and output csv files instead of xlsx files")
+parser.add_argument("-t", "--threads", type=int, default=4, help="maximum number of threads z3 may use for solving")
+parser.add_argument("-e", "--events", type=str, help="stream solving progress as JSON lines to this file, or - for stdout, "
+                                                     +"and keep a partial-results file updated as divisions are scheduled")
 
 args = parser.parse_args()
 
+set_param('parallel.enable', args.threads > 1)
+set_param('parallel.threads.max', args.threads)
+
 reformat_file_only = False # Set True to skip the constraint solving and just load and re-save the file (used to improve formatting)
 partial_test       = False # Set True to only process a couple of divisions, detailed below
 file_format       = 'csv' if args.csv else 'xlsx'
@@ -43,7 +48,46 @@ league_start_date = datetime.strptime(args.start_date, date_format)
 weeks_in_league = args.weeks
 weeks_spread = args.spread
 weeks = range(0, weeks_in_league)
-output_filename   = '{}/results-{}-{}-{}wks-{}restdays.{}'.format(file_prefix, args.directory.split('-')[-1], league_start_date.strftime('%d%b'), weeks_in_league, rest_days, file_format)
+output_basename   = 'results-{}-{}-{}wks-{}restdays.{}'.format(os.path.basename(file_prefix).split('-')[-1], league_start_date.strftime('%d%b'), weeks_in_league, rest_days, file_format)
+output_filename   = '{}/{}'.format(file_prefix, output_basename)
+partial_output_filename = '{}/partial-{}'.format(file_prefix, output_basename)
+
+events_file = None
+if args.events == '-':
+    events_file = sys.stdout
+    sys.stdout = sys.stderr  # keep the human readable progress out of the event stream
+elif args.events:
+    events_file = open(args.events, 'w')
+
+
+def emit_event(event, **details):
+    """ writes one JSON line describing solving progress to the --events stream, if there is one """
+    if events_file:
+        events_file.write(json.dumps(dict(event=event, **details), default=str) + "\n")
+        events_file.flush()
+
+
+def write_results(fixtures, fixture_file_headers, filename):
+    """ writes fixtures via a temporary file so that readers such as checker.py never see a half written file """
+    temp_filename = os.path.join(os.path.dirname(filename), '.' + os.path.basename(filename))
+    if file_format == 'xlsx':
+        with pandas.ExcelWriter(temp_filename, date_format='dd/mm/yyyy', datetime_format='HH:MM:SS') as writer:
+            for i, fixture in enumerate(fixtures):
+                if partial_test and (not fixture["Date"] or pandas.isnull(fixture["Date"])):
+                    continue
+                fixtures[i]['Date'] = datetime.strptime(fixture['Date'], date_format).date()
+                fixtures[i]['Time'] = datetime.strptime(str(fixtures[i]['Time']).strip(), '%H:%M').time()
+
+            dataframe = pandas.DataFrame.from_records(fixtures, columns=fixture_file_headers)
+            dataframe.to_excel(writer, index=False)
+    else:
+        with open(temp_filename, 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fixture_file_headers, delimiter=',', quotechar='"')
+            writer.writeheader()
+            for fixture in fixtures:
+                writer.writerow(fixture)
+    os.replace(temp_filename, filename)
+
 
 if file_format == 'xlsx':
     # make fixtures list of dicts with keys: Date,Time,League Type,Event,Draw,Nr,Team 1,Team 2,Court,Location
@@ -141,6 +185,7 @@ if len(error_messages):
     print("One or more errors were found which will prevent the files from being processed:")
     for message in error_messages:
         print(" - " + message)
+    emit_event('error', messages=error_messages)
     exit()
 
 if not reformat_file_only:
@@ -460,6 +505,88 @@ if not reformat_file_only:
                    )
 
 
+    def match_date(home_team, week):
+        return slots[team_slots[home_team]]['Date'] + timedelta(days=7*week*weeks_spread)
+
+
+    def scheduled_matches_for_division(model, division):
+        """ returns the {(home_team, away_team): date} matches the model gives for a division """
+        grid = grids_by_division[division][0]
+        teams = teams_by_division[division]
+        return {(home_team, away_team): match_date(home_team, week)
+                for home_team in teams
+                for away_team in teams
+                for week in weeks
+                if model[grid[home_team, away_team, week]]}
+
+
+    def apply_schedule(scheduled_matches):
+        """ returns copies of the fixtures with dates and times from scheduled_matches, plus their headers """
+        scheduled_fixtures = []
+        new_column_headers = []
+        for fixture in fixtures:
+            fixture = dict(fixture)
+            scheduled_fixtures.append(fixture)
+            team1 = fixture['Team 1']
+            team2 = fixture['Team 2']
+
+            if (team1, team2) in scheduled_matches:
+                fixture['Team 1']   = team1
+                fixture['Team 2']   = team2
+                fixture['Date']     = scheduled_matches[team1, team2].strftime(date_format)
+                fixture['Time']     = slots[team_slots[team1]]['Time']
+            elif (team2, team1) in scheduled_matches:
+                fixture['Team 1']   = team2
+                fixture['Team 2']   = team1
+                fixture['Date']     = scheduled_matches[team2, team1].strftime(date_format)
+                fixture['Time']     = slots[team_slots[team2]]['Time']
+            elif partial_test:
+                continue
+            else:
+                raise Exception(f'Match between {team1} and {team2} not found in scheduled matches list')
+
+            fixture['Court']    = '1'
+            fixture['Location'] = 'Main Location'
+
+            teams = teams_by_division[division_for_team[team1]]
+            has_team_columns = {f'has_team_{idx}': 1 if team_name in (team1, team2) else 0
+                                for idx, team_name in enumerate(teams, 1)}
+            new_column_headers += has_team_columns.keys()
+            fixture.update(has_team_columns)
+
+        return scheduled_fixtures, list(fixture_file_headers) + sorted(list(set(new_column_headers)))
+
+
+    def emit_division_schedule(model, division, stage):
+        """ emits a division's fixtures and KPIs as they stand in the model at this stage of solving """
+        if not events_file:
+            return
+        kpis = grids_by_division[division][4]
+        matches = scheduled_matches_for_division(model, division)
+        emit_event('schedule', stage=stage, division=division,
+                   kpis={kpi_name: model[kpi].as_long() for kpi_name, kpi in kpis.items()},
+                   fixtures=[{'date': date.strftime(date_format),
+                              'time': str(slots[team_slots[home_team]]['Time']).strip(),
+                              'home': home_team,
+                              'away': away_team}
+                             for (home_team, away_team), date in sorted(matches.items(), key=lambda x: x[1])])
+
+
+    def update_partial_results(model, stage):
+        """ rewrites the partial-results file from the model so fixtures can be checked before solving ends """
+        if not events_file:
+            return
+        scheduled_matches = {}
+        for division in grids_by_division:
+            scheduled_matches.update(scheduled_matches_for_division(model, division))
+        partial_fixtures, partial_headers = apply_schedule(scheduled_matches)
+        write_results(partial_fixtures, partial_headers, os.path.join(dir_path, partial_output_filename))
+        emit_event('partial_results', stage=stage, file=partial_output_filename)
+
+
+    kpi_priority = ['home_away_imbalance', 'away_twice_at_same_club', 'repeat_of_old_fixture']
+    emit_event('start', directory=file_prefix, divisions=list(grids_by_division), kpis=kpi_priority)
+
     solver = Solver()
     for division, (grid, match_week, away_team_grid, home_team_grid, kpis) in grids_by_division.items():
         teams = teams_by_division[division]
@@ -467,15 +594,21 @@ if not reformat_file_only:
                                            away_team_grid, home_team_grid,
                                            teams))
         solver.add(kpis_for_division(grid, match_week, away_team_grid, home_team_grid, kpis))
-        print('provisional {}: {}'.format(division, solver.check()))
+        result = solver.check()
+        print('provisional {}: {}'.format(division, result))
+        emit_event('provisional', division=division, result=str(result))
 
     solver.add(conditions_between_divisions(grids_by_division))
-    print('Constraining shared slots: {}'.format(solver.check()))
+    result = solver.check()
+    print('Constraining shared slots: {}'.format(result))
+    emit_event('shared_slots', result=str(result))
 
     model = solver.model()
+    for division in grids_by_division:
+        emit_division_schedule(model, division, 'provisional')
+    update_partial_results(model, 'provisional')
 
     print('')
-    kpi_priority = ['home_away_imbalance', 'away_twice_at_same_club', 'repeat_of_old_fixture']
     for kpi_name in kpi_priority:
         print(f'Testing KPI {kpi_name}')
 
@@ -486,9 +619,15 @@ if not reformat_file_only:
 
         if solver.check() == sat:
             print('yes!')
+            emit_event('kpi', kpi=kpi_name, division=None, limit=1, result='sat')
+            model = solver.model()
+            for division in grids_by_division:
+                emit_division_schedule(model, division, kpi_name)
+            update_partial_results(model, kpi_name)
             continue
         else:
             print('no, try individually...')
+            emit_event('kpi', kpi=kpi_name, division=None, limit=1, result='unsat')
             solver.pop()
 
         # else test with each < 1,  backing off as needed
@@ -502,8 +641,15 @@ if not reformat_file_only:
 
                 if solver.check() == sat:
                     print('yes!')
+                    emit_event('kpi', kpi=kpi_name, division=division, limit=kpi_limit, result='sat')
+                    model = solver.model()
+                    # the new model can move fixtures in any division, not just the one constrained
+                    for other_division in grids_by_division:
+                        emit_division_schedule(model, other_division, kpi_name)
+                    update_partial_results(model, kpi_name)
                     break
                 else:
+                    emit_event('kpi', kpi=kpi_name, division=division, limit=kpi_limit, result='unsat')
                     kpi_limit += 1
                     print('no, ', end='', flush=True)
                     solver.pop()
@@ -513,27 +659,20 @@ if not reformat_file_only:
     model = solver.model()
 
 
-    def match_date(home_team, week):
-        return slots[team_slots[home_team]]['Date'] + timedelta(days=7*week*weeks_spread)
-
-
     scheduled_matches = {}
     for division, (grid, match_week, away_team_grid, home_team_grid, kpis) in grids_by_division.items():
         print(f"= {division} =========== ")
         teams = teams_by_division[division]
+        division_matches = scheduled_matches_for_division(model, division)
+        scheduled_matches.update(division_matches)
+        emit_division_schedule(model, division, 'final')
         print(" ↓ home team {:>26}".format('   \    away team → \t'), end='')
         print('\t'.join(f'({idx+1})' for idx in range(0, len(teams))))
         for home_idx, home_team in enumerate(teams):
-            matches = {i: match_date(home_team, week)
-                       for i, away_team in enumerate(teams)
-                       for week in weeks
-                       if model[grid[home_team, away_team, week]]}
-
             print(f"({home_idx+1}){home_team:>31} :", end='')
-            for i in range(0, len(teams)):
-                if i in matches:
-                    scheduled_matches[home_team, teams[i]] = matches[i]
-                    print(f'\t{matches[i].strftime("%d%b")}', end='')
+            for away_team in teams:
+                if (home_team, away_team) in division_matches:
+                    print(f'\t{division_matches[home_team, away_team].strftime("%d%b")}', end='')
                 else:
                     print('\t -', end='')
             print('')
@@ -560,36 +699,7 @@ if not reformat_file_only:
         # print('')
 
 
-    new_column_headers = []
-    for fixture in fixtures:
-        team1 = fixture['Team 1']
-        team2 = fixture['Team 2']
-
-        if (team1, team2) in scheduled_matches:
-            fixture['Team 1']   = team1
-            fixture['Team 2']   = team2
-            fixture['Date']     = scheduled_matches[team1, team2].strftime(date_format)
-            fixture['Time']     = slots[team_slots[team1]]['Time']
-        elif (team2, team1) in scheduled_matches:
-            fixture['Team 1']   = team2
-            fixture['Team 2']   = team1
-            fixture['Date']     = scheduled_matches[team2, team1].strftime(date_format)
-            fixture['Time']     = slots[team_slots[team2]]['Time']
-        elif partial_test:
-            continue
-        else:
-            raise Exception(f'Match between {team1} and {team2} not found in scheduled matches list')
-
-        fixture['Court']    = '1'
-        fixture['Location'] = 'Main Location'
-
-        teams = teams_by_division[division_for_team[team1]]
-        has_team_columns = {f'has_team_{idx}': 1 if team_name in (team1, team2) else 0
-                            for idx, team_name in enumerate(teams, 1)}
-        new_column_headers += has_team_columns.keys()
-        fixture.update(has_team_columns)
-
-    fixture_file_headers = list(fixture_file_headers) + sorted(list(set(new_column_headers)))
+    fixtures, fixture_file_headers = apply_schedule(scheduled_matches)
 
 
 if not partial_test:
@@ -616,20 +726,7 @@ if not partial_test:
             print(f" ! shared slot clash: {team1} and {team2} clash on {dates_str}")
 
 
-# if False and file_format == 'xlsx': ############### TESTING - REMOVE
-if file_format == 'xlsx':
-    with pandas.ExcelWriter(os.path.join(dir_path, output_filename), date_format='dd/mm/yyyy', datetime_format='HH:MM:SS') as writer:
-        for i, fixture in enumerate(fixtures):
-            if partial_test and (not fixture["Date"] or pandas.isnull(fixture["Date"])):
-                continue
-            fixtures[i]['Date'] = datetime.strptime(fixture['Date'], date_format).date()
-            fixtures[i]['Time'] = datetime.strptime(str(fixtures[i]['Time']).strip(), '%H:%M').time()
-
-        dataframe = pandas.DataFrame.from_records(fixtures, columns=fixture_file_headers)
-        dataframe.to_excel(writer, index=False)
-else:
-    with open(os.path.join(dir_path, output_filename), 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fixture_file_headers, delimiter=',', quotechar='"')
-        writer.writeheader()
-        for fixture in fixtures:
-            writer.writerow(fixture)
+write_results(fixtures, fixture_file_headers, os.path.join(dir_path, output_filename))
+emit_event('results', file=output_filename)
+if events_file and os.path.exists(os.path.join(dir_path, partial_output_filename)):
+    os.remove(os.path.join(dir_path, partial_output_filename))
@@ -0,0 +1,337 @@
+"""
+checks many clubs' matches against their nominations, as nominations.html does for one club in the browser
+usage like:
+docker exec -ti leaguer-app-1 python3 nominations.py 2025-Summer/* -o 2025-Summer/nominations-report.xlsx
+
+each club directory holds the Tournament Software matches.xlsx export and, optionally, its nominations.xlsx.
+Players and teams are flagged using the same rules as nominations.html and written to one report covering every club.
+"""
+import os
+import re
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import pandas
+
+parser = argparse.ArgumentParser()
+parser.add_argument("directories", type=str, nargs="+", help="club directories, each containing a matches file and optionally a nominations file")
+parser.add_argument("-o", "--output", type=str, default="nominations-report.xlsx", help="path of the consolidated report to write")
+parser.add_argument("-m", "--matches-name", type=str, default="matches.xlsx", help="filename of the matches export in each club directory")
+parser.add_argument("-n", "--nominations-name", type=str, default="nominations.xlsx", help="filename of the nominations in each club directory")
+parser.add_argument("-j", "--jobs", type=int, default=0, help="how many clubs to check at once, 0 for one per core")
+
+excel_epoch    = datetime(1899, 12, 30)
+player_columns = (("HomeTeamName", "HomeTeamPlayer1_Memberid"), ("HomeTeamName", "HomeTeamPlayer2_Memberid"),
+                  ("AwayTeamName", "AwayTeamPlayer1_Memberid"), ("AwayTeamName", "AwayTeamPlayer2_Memberid"))
+nomination_columns = ("Nomination 1", "Nomination 2", "Nomination 3", "Nomination 4")
+category_names = {'played_down': "Played down", 'played_up_only': "Only played up", 'loyal': "Only played for one team"}
+
+
+def read_rows(filename):
+    """ returns the headers and rows of an xlsx file's first sheet, each row a dict leaving out empty cells as SheetJS does """
+    with open(filename, "rb") as xlsxfile:
+        dataframe = pandas.read_excel(xlsxfile, engine="openpyxl", dtype=object)
+    dataframe.columns = [str(x) for x in dataframe.columns]
+    return list(dataframe.columns), [{k: v for k, v in row.items() if not is_blank(v)}
+                                     for row in dataframe.to_dict(orient="records")]
+
+
+def is_blank(value):
+    return value is None or (isinstance(value, float) and value != value) or value == ''
+
+
+def member_id(value):
+    """ returns a member id as the string nominations.html compares it as, so 12345 and 12345.0 match "12345" """
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def member_sort_key(memberid):
+    return (0, int(memberid), '') if memberid.isdigit() else (1, 0, memberid)
+
+
+def match_date(value):
+    """ returns the date of a MatchDate cell, which may be a date, an Excel serial number or text, or None """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (excel_epoch + timedelta(days=int(value))).date() if value > 1 else None
+    for date_format in ('%Y-%m-%d', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(str(value).strip(), date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def team_rank(team):
+    """ returns the trailing team number of a team name, eg 2 for "Somewhere LTC 2", or infinity if there isn't one """
+    match = re.search(r"\d+$", team) if isinstance(team, str) else None
+    return int(match[0]) if match else float('inf')
+
+
+def ordinal(i):
+    if i % 10 == 1 and i % 100 != 11:
+        return f"{i}st"
+    if i % 10 == 2 and i % 100 != 12:
+        return f"{i}nd"
+    if i % 10 == 3 and i % 100 != 13:
+        return f"{i}rd"
+    return f"{i}th"
+
+
+def format_fixture_date(date):
+    return f"{date.strftime('%A')} {ordinal(date.day)} {date.strftime('%B %Y')}"
+
+
+def load_nominations(headers, rows):
+    """ returns {member id: nominated team} from the nominations file """
+    nominations = {}
+    if any(column not in headers for column in ("Team",) + nomination_columns):
+        print("One or more required columns ('Team', 'Nomination 1-4') not found in nominations file.")
+        return nominations
+    for row in rows:
+        nominees = [row.get(column) for column in nomination_columns]
+        if row.get("Team") and all(nominees):
+            for nominee in nominees:
+                nominations[member_id(nominee)] = row["Team"]
+    return nominations
+
+
+def index_matches(rows):
+    """
+    makes one pass over the matches rows, returning
+     - player_fixtures: {member id: [fixtures in date order]}, each fixture a dict of date, team and key
+     - team_fixtures: {team: {fixture key: fixture}}, each fixture a dict of date, opponent and the ids of everyone who played
+     - players_by_team_date: {(team, date): [member ids]} of who each player is recorded as playing for on each date
+    """
+    player_fixtures = {}
+    team_fixtures = {}
+    for row in rows:
+        date = match_date(row.get("MatchDate"))
+        if date is None:
+            continue
+        division = row.get("Division")
+        home_team, away_team = row.get("HomeTeamName"), row.get("AwayTeamName")
+        key = f"{date.isoformat()}|{division}|{home_team}|{away_team}"
+
+        players = [member_id(row[column]) for _, column in player_columns if column in row]
+        for team, opponent in ((home_team, away_team), (away_team, home_team)):
+            if not team:
+                continue
+            fixture = team_fixtures.setdefault(team, {}).setdefault(key, {'date': date, 'opponent': opponent, 'players': set()})
+            fixture['players'].update(players)
+
+        if not division or not home_team or not away_team:
+            continue
+        for team_column, column in player_columns:
+            if column in row:
+                player_fixtures.setdefault(member_id(row[column]), {})[key] = {'date': date, 'team': row[team_column], 'key': key}
+
+    player_fixtures = {memberid: sorted(fixtures.values(), key=lambda x: x['date'])
+                       for memberid, fixtures in sorted(player_fixtures.items(), key=lambda x: member_sort_key(x[0]))}
+    players_by_team_date = {}
+    for memberid, fixtures in player_fixtures.items():
+        for fixture in fixtures:
+            players_by_team_date.setdefault((fixture['team'], fixture['date']), []).append(memberid)
+    return player_fixtures, team_fixtures, players_by_team_date
+
+
+def teams_in_player_order(player_fixtures):
+    """ returns teams in the order they are first met walking each player's fixtures, as nominations.html walks them """
+    teams = {}
+    for fixtures in player_fixtures.values():
+        for fixture in fixtures:
+            teams.setdefault(fixture['team'], []).append(fixture)
+    return teams
+
+
+def team_match_numbers(player_fixtures):
+    """ returns {fixture key: which of its team's matches it was}, counting only matches that players were recorded in """
+    match_numbers = {}
+    for team, fixtures in teams_in_player_order(player_fixtures).items():
+        for number, key in enumerate(sorted(set(x['key'] for x in fixtures)), 1):
+            match_numbers[key] = number
+    return match_numbers
+
+
+def default_nominations(player_fixtures, players_by_team_date, nominations):
+    """
+    for teams nobody was explicitly nominated to, players in the team's first match count as nominated to it.
+    returns {member id: the team and date which made them a default nominee}
+    """
+    nominated_teams = set(nominations.values())
+    defaults = {}
+    for team, fixtures in teams_in_player_order(player_fixtures).items():
+        if team in nominated_teams:
+            continue
+        earliest_date = min(x['date'] for x in fixtures)
+        for memberid in players_by_team_date[team, earliest_date]:
+            if memberid not in nominations and memberid not in defaults:
+                defaults[memberid] = {'team': team, 'date': earliest_date}
+    return defaults
+
+
+def player_problems(fixtures, nomination_rank, played_up_threshold):
+    """
+    returns a list of flags, one per fixture, marking those a player shouldn't have played:
+    any for a team ranked below their nomination, and, once they have played up played_up_threshold
+    times, any for a team ranked below the worst of those played up teams
+    """
+    problems = [False] * len(fixtures)
+    if nomination_rank == float('inf'):
+        return problems
+    played_up_ranks = []
+    max_allowed_rank = float('inf')
+    for i, fixture in enumerate(fixtures):
+        rank = team_rank(fixture['team'])
+        problems[i] = rank > nomination_rank or rank > max_allowed_rank
+        if rank < nomination_rank:
+            played_up_ranks.append(rank)
+            if len(played_up_ranks) >= played_up_threshold:
+                max_allowed_rank = sorted(played_up_ranks)[played_up_threshold - 1]
+    return problems
+
+
+def team_quotas(team_fixtures, nominations, played_up_threshold):
+    """
+    returns {team: status} checking each fully nominated team fielded 2 nominees in its first match
+    and all 4 by its 2nd (mixed) or 3rd match
+    """
+    nominees_by_team = {}
+    for memberid, team in nominations.items():
+        nominees_by_team.setdefault(team, set()).add(memberid)
+    final_check_index = 1 if played_up_threshold == 2 else 2
+
+    statuses = {}
+    for team, fixtures in team_fixtures.items():
+        nominees = nominees_by_team.get(team, set())
+        status = {'has_full_nominations': len(nominees) == 4, 'fixtures': [], 'problem_matches': []}
+        nominees_played = set()
+        for i, fixture in enumerate(sorted(fixtures.values(), key=lambda x: x['date'])):
+            nominees_in_fixture = fixture['players'] & nominees
+            nominees_played |= nominees_in_fixture
+            status['fixtures'].append({'opponent': fixture['opponent'], 'nominees_played': len(nominees_played)})
+            if status['has_full_nominations']:
+                if i == 0 and len(nominees_in_fixture) < 2:
+                    status['problem_matches'].append(i)
+                if i == final_check_index and len(nominees_played) < 4:
+                    status['problem_matches'].append(i)
+        statuses[team] = status
+    return statuses
+
+
+def check_club(directory, matches_name, nominations_name):
+    """ checks one club's matches against its nominations, returning rows for each sheet of the report """
+    club = os.path.basename(directory.rstrip('/'))
+    summary = {'Club': club}
+    try:
+        _, match_rows = read_rows(os.path.join(directory, matches_name))
+        nominations_filename = os.path.join(directory, nominations_name)
+        has_nominations_file = os.path.isfile(nominations_filename)
+        nominations = load_nominations(*read_rows(nominations_filename)) if has_nominations_file else {}
+    except Exception as e:  # a corrupt or unreadable workbook shouldn't stop the other clubs being reported
+        summary['Error'] = f'{type(e).__name__}: {e}'
+        return summary, [], []
+
+    league_type = str(match_rows[0].get("LeagueType", '')) if match_rows else ''
+    is_mixed_league = 'mixed' in league_type.lower()
+    played_up_threshold = 2 if is_mixed_league else 3
+
+    player_fixtures, team_fixtures, players_by_team_date = index_matches(match_rows)
+    match_numbers = team_match_numbers(player_fixtures)
+    defaults = default_nominations(player_fixtures, players_by_team_date, nominations)
+
+    player_rows = []
+    for memberid, fixtures in player_fixtures.items():
+        nominated_team = nominations.get(memberid, '')
+        default = defaults.get(memberid)
+        problems = [False] * len(fixtures)
+        if len(fixtures) <= 1 or all(x['team'] == fixtures[0]['team'] for x in fixtures):
+            category = 'loyal'
+        else:
+            nomination_rank = team_rank(nominated_team or None)
+            if nomination_rank == float('inf') and default:
+                nomination_rank = team_rank(default['team'])
+            problems = player_problems(fixtures, nomination_rank, played_up_threshold)
+            moved_down = any(team_rank(x['team']) > team_rank(fixtures[i - 1]['team']) for i, x in enumerate(fixtures) if i > 0)
+            category = 'played_down' if any(problems) or moved_down else 'played_up_only'
+
+        row = {'Club': club,
+               'Member ID': memberid,
+               'Category': category_names[category],
+               'Flagged': 'yes' if any(problems) else '',
+               'Nominated Team': nominated_team,
+               'Default Nomination': default['team'] if default else '',
+               'Flagged Matches': ', '.join(ordinal(i + 1) for i, problem in enumerate(problems) if problem)}
+        for i, fixture in enumerate(fixtures):
+            number = match_numbers.get(fixture['key'])
+            row[f"Player's {ordinal(i + 1)} match"] = (f"{fixture['team']}, {format_fixture_date(fixture['date'])}"
+                                                     + (f", team's {ordinal(number)} Match" if number else ''))
+        player_rows.append(row)
+
+    # as nominations.html lists them: flagged players first, then those who played down, played up, then loyal players
+    category_order = list(category_names.values())
+    player_rows.sort(key=lambda x: (category_order.index(x['Category']), not x['Flagged'], member_sort_key(x['Member ID'])))
+
+    team_rows = []
+    for team, status in team_quotas(team_fixtures, nominations, played_up_threshold).items():
+        row = {'Club': club,
+               'Team': team,
+               'Has Nominations': 'yes' if status['has_full_nominations'] else '',
+               'Flagged': 'yes' if status['problem_matches'] else '',
+               'Flagged Matches': ', '.join(ordinal(i + 1) for i in status['problem_matches'])}
+        for i, fixture in enumerate(status['fixtures']):
+            row[f"Team's {ordinal(i + 1)} match"] = f"vs {fixture['opponent']}, {fixture['nominees_played']} / 4 nominated players played so far"
+        team_rows.append(row)
+    team_rows.sort(key=lambda x: (not x['Flagged'], str(x['Team']).casefold()))
+
+    summary.update({
+        'League Type': "Mixed League" if is_mixed_league else "Men's/Ladies' League",
+        'Played Up Threshold': played_up_threshold,
+        'Players': len(player_rows),
+        'Flagged Players': sum(1 for x in player_rows if x['Flagged']),
+        'Teams': len(team_rows),
+        'Flagged Teams': sum(1 for x in team_rows if x['Flagged']),
+        'Nominations File': 'yes' if has_nominations_file else '',
+    })
+    return summary, player_rows, team_rows
+
+
+def ordered_columns(rows, leading_columns):
+    """ returns the leading columns followed by the numbered match columns found in rows, in match order """
+    match_columns = {column for row in rows for column in row if column not in leading_columns}
+    return list(leading_columns) + sorted(match_columns, key=lambda x: int(re.search(r"\d+", x)[0]))
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    directories = [x for x in args.directories if os.path.isdir(x)]
+
+    summaries, player_rows, team_rows = [], [], []
+    with ProcessPoolExecutor(max_workers=args.jobs or None) as executor:
+        results = executor.map(check_club, directories, [args.matches_name] * len(directories),
+                               [args.nominations_name] * len(directories))
+        for summary, club_player_rows, club_team_rows in results:
+            summaries.append(summary)
+            player_rows += club_player_rows
+            team_rows += club_team_rows
+            if 'Error' in summary:
+                print(f"{summary['Club']:<30} ! {summary['Error']}")
+            else:
+                print(f"{summary['Club']:<30} {summary['Flagged Players']:>3} of {summary['Players']:>3} players and "
+                      f"{summary['Flagged Teams']:>2} of {summary['Teams']:>2} teams flagged ({summary['League Type']})")
+
+    summary_columns = ['Club', 'League Type', 'Played Up Threshold', 'Nominations File', 'Players', 'Flagged Players',
+                       'Teams', 'Flagged Teams', 'Error']
+    player_columns_out = ordered_columns(player_rows, ['Club', 'Member ID', 'Category', 'Flagged', 'Nominated Team',
+                                                       'Default Nomination', 'Flagged Matches'])
+    team_columns_out = ordered_columns(team_rows, ['Club', 'Team', 'Has Nominations', 'Flagged', 'Flagged Matches'])
+    with pandas.ExcelWriter(args.output) as writer:
+        pandas.DataFrame.from_records(summaries, columns=summary_columns).to_excel(writer, sheet_name='Clubs', index=False)
+        pandas.DataFrame.from_records(player_rows, columns=player_columns_out).to_excel(writer, sheet_name='Players', index=False)
+        pandas.DataFrame.from_records(team_rows, columns=team_columns_out).to_excel(writer, sheet_name='Teams', index=False)
+
+    print('')
+    print(f'Report for {len(summaries)} clubs written to {args.output}')